@@ -19,6 +19,7 @@ setup(
     author_email="zebra-squad@liip.ch",
     url="https://github.com/liip/taxi-zebra",
     install_requires=install_requires,
+    extras_require={"orjson": ["orjson"]},
     license="wtfpl",
     python_requires=">=3.8",
     entry_points={
@@ -1,12 +1,15 @@
-import json
+import atexit
+import datetime
+import hashlib
 import logging
+import os
 from collections import namedtuple
-from datetime import datetime
 from functools import wraps
-from urllib import parse
 
 import click
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
 
 from taxi import __version__ as taxi_version
 from taxi.aliases import aliases_database
@@ -14,16 +17,39 @@ from taxi.backends import BaseBackend, PushEntryFailed
 from taxi.exceptions import TaxiException
 from taxi.projects import Activity, Project
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 from .roles import INDIVIDUAL_ACTION_ID, NEVER_SAVE_ROLE_ID
 from .ui import format_response_messages, prompt_role
-from .utils import get_role_id_from_alias, to_zebra_params
+from .utils import (
+    delete_cache,
+    get_default_cache_dir,
+    get_role_id_from_alias,
+    parse_date,
+    read_cache,
+    to_zebra_params,
+    write_cache,
+)
 
 logger = logging.getLogger(__name__)
 
+# Roles rarely change, and an outdated cache is detected when Zebra rejects a role
+USER_ROLES_CACHE_TTL = 24 * 60 * 60
+
 
 Role = namedtuple("Role", ["id", "parent_id", "full_name"])
 
 
+def decode_response(response):
+    """
+    Return the decoded JSON body of the given response. Raise `ValueError` if the body is not valid JSON.
+    """
+    return json_loads(response.content)
+
+
 def get_alias_id(alias):
     return aliases_database[alias].mapping[1]
 
@@ -58,26 +84,80 @@ class ZebraBackend(BaseBackend):
         if not self.path.endswith("/"):
             self.path += "/"
 
+        self._base_url = "https://{host}:{port}{base_path}".format(
+            host=self.hostname, port=self.port, base_path=self.path
+        )
+        self._api_base_url = self._base_url + "api/v2/"
+
         self._session = requests.Session()
         self._session.headers.update({"user-agent": "Taxi {}".format(taxi_version)})
+        # Keep the TLS connection to Zebra alive between requests, and retry idempotent requests when the server is
+        # temporarily unavailable
+        self._session.mount(
+            "https://",
+            HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=20,
+                max_retries=Retry(
+                    total=3,
+                    backoff_factor=0.3,
+                    status_forcelist=(502, 503, 504),
+                    # Return the last response once retries are exhausted so that callers can handle it like any
+                    # other error response
+                    raise_on_status=False,
+                ),
+            ),
+        )
         self._user_info = None
+        self._user_roles = None
+        self._settings_changed = False
+
+        self._cache_dir = self.options.get("cache_dir") or get_default_cache_dir()
+        self._cache_key = hashlib.sha256(
+            "{}:{}".format(self.hostname, self.token).encode()
+        ).hexdigest()[:16]
+
+    def get_cache_path(self, name):
+        return os.path.join(self._cache_dir, "{}-{}.json".format(name, self._cache_key))
+
+    def close(self):
+        """
+        Release the connections kept open by the HTTP session.
+        """
+        self._session.close()
+
+    def write_settings(self):
+        """
+        Write the configuration file if aliases were updated while pushing entries.
+        """
+        if self._settings_changed:
+            try:
+                self.context["settings"].write_config()
+            except OSError as e:
+                click.secho(
+                    "Could not save the updated aliases: {}".format(e), fg="yellow"
+                )
+            self._settings_changed = False
+
+    def post_push_entries(self):
+        try:
+            self.write_settings()
+        finally:
+            self.close()
 
     def get_api_url(self, url):
-        return self.get_full_url("/api/v2{url}".format(url=url))
+        # Remove slash at the start of the string since the base URLs already end with a slash
+        return self._api_base_url + url.lstrip("/")
 
     def get_full_url(self, url):
-        # Remove slash at the start of the string since self.path already ends
-        # with a slash
-        url = url.lstrip("/")
-
-        return "https://{host}:{port}{base_path}{url}".format(
-            host=self.hostname, port=self.port, base_path=self.path, url=url
-        )
+        return self._base_url + url.lstrip("/")
 
     def zebra_request(self, method, url, **kwargs):
         response = self._session.request(method=method, url=url, **kwargs)
 
         if response.status_code in {401, 403}:
+            # Don't keep using roles fetched with credentials that are no longer accepted
+            self.invalidate_user_roles()
             raise TaxiException("Login failed, please check your credentials")
 
         return response
@@ -88,13 +168,15 @@ class ZebraBackend(BaseBackend):
 
         Starting with Zebra 14.97, that's possible for clients, and will be effective in 2023/10
         """
+        if "Authorization" in self._session.headers:
+            return
+
         self._session.headers.update({"Authorization": "Bearer {}".format(self.token)})
 
     @needs_authentication
-    def _push_entry(self, date, entry, role_id, *args, **kwargs):
+    def _push_entry(self, date, entry, mapping, role_id, *args, **kwargs):
         post_url = self.get_api_url("/timesheets/")
 
-        mapping = aliases_database[entry.alias]
         if role_id == INDIVIDUAL_ACTION_ID:
             kwargs["individual_action"] = True
         elif role_id:
@@ -106,28 +188,39 @@ class ZebraBackend(BaseBackend):
                 "time": entry.hours,
                 "project_id": mapping.mapping[0],
                 "activity_id": mapping.mapping[1],
-                "date": date.strftime("%Y-%m-%d"),
+                "date": date.isoformat(),
                 "description": entry.description,
             },
             **kwargs
         )
 
-        return self.zebra_request("post", post_url, data=to_zebra_params(parameters))
+        response = self.zebra_request(
+            "post", post_url, data=to_zebra_params(parameters)
+        )
+
+        return response, decode_response(response)
 
     @needs_authentication
     def push_entry(self, date, entry):
+        mapping = aliases_database[entry.alias]
         user_roles = self.get_user_roles()
         alias_role_id = get_role_id_from_alias(entry.alias)
 
         if alias_role_id == NEVER_SAVE_ROLE_ID:
             alias_role_id = None
 
-        response = self._push_entry(date, entry, role_id=alias_role_id)
-        response_json = response.json()
+        response, response_json = self._push_entry(
+            date, entry, mapping, role_id=alias_role_id
+        )
 
         if not response:
             error_code = response_json.get("errorCode")
             if error_code in {"role_needed", "role_invalid"}:
+                # The cached roles might be outdated. Since the user is about to pick one of them, get the current
+                # ones from Zebra
+                self.invalidate_user_roles()
+                user_roles = self.get_user_roles()
+
                 if error_code == "role_needed":
                     prompt = "You're trying to push the following entry to an activity which doesn't have any associated role:"
                 elif error_code == "role_invalid":
@@ -146,18 +239,31 @@ class ZebraBackend(BaseBackend):
                 default_role = (
                     user_roles.get(default_role_id) if default_role_id else None
                 )
-                selected_role = prompt_role(
+                selected_role, alias_updated = prompt_role(
                     entry,
                     list(user_roles.values()),
                     self.context,
                     default_role=default_role,
                 )
+
+                if alias_updated:
+                    # Only write the configuration file once all the entries have been pushed, or when exiting if the
+                    # push gets interrupted
+                    if not self._settings_changed:
+                        atexit.register(self.write_settings)
+                    self._settings_changed = True
+
                 selected_role_id = (
                     selected_role.id if selected_role else INDIVIDUAL_ACTION_ID
                 )
 
-                response = self._push_entry(date, entry, role_id=selected_role_id)
-                response_json = response.json()
+                response, response_json = self._push_entry(
+                    date, entry, mapping, role_id=selected_role_id
+                )
+
+                if not response and response_json.get("errorCode") == "role_invalid":
+                    # Don't offer the same outdated roles again on the next push
+                    self.invalidate_user_roles()
         else:
             selected_role = user_roles.get(alias_role_id)
 
@@ -180,15 +286,27 @@ class ZebraBackend(BaseBackend):
     @needs_authentication
     def get_projects(self):
         projects_url = self.get_api_url("/projects/")
+        cache_path = self.get_cache_path("projects")
+        cache = read_cache(cache_path)
+        headers = {"If-None-Match": cache["etag"]} if cache else {}
+
+        response = self.zebra_request("get", projects_url, headers=headers)
+
+        if cache and response.status_code == 304:
+            projects = cache["projects"]
+        else:
+            try:
+                projects = decode_response(response)
+            except ValueError:
+                raise TaxiException(
+                    "Unexpected response from the server (%s).  Check your "
+                    "credentials" % response.content
+                )
+
+            etag = response.headers.get("ETag")
+            if response and etag:
+                write_cache(cache_path, {"etag": etag, "projects": projects})
 
-        try:
-            response = self.zebra_request("get", projects_url)
-            projects = response.json()
-        except ValueError:
-            raise TaxiException(
-                "Unexpected response from the server (%s).  Check your "
-                "credentials" % response.content
-            )
         projects_list = []
         date_attrs = ("start_date", "end_date")
 
@@ -204,12 +322,7 @@ class ZebraBackend(BaseBackend):
             )
 
             for date_attr in date_attrs:
-                try:
-                    date = datetime.strptime(project[date_attr], "%Y-%m-%d").date()
-                except (ValueError, TypeError):
-                    date = None
-
-                setattr(p, date_attr, date)
+                setattr(p, date_attr, parse_date(project[date_attr]))
 
             for activity in project["activities"]:
                 a = Activity(activity["id"], activity["name"], activity["is_active"])
@@ -226,7 +339,7 @@ class ZebraBackend(BaseBackend):
     def get_user_info(self):
         if getattr(self, "_user_info", None) is None:
             user_info_url = self.get_api_url("/users/me")
-            data = self.zebra_request("get", user_info_url).json()["data"]
+            data = decode_response(self.zebra_request("get", user_info_url))["data"]
 
             self._user_info = data
 
@@ -243,13 +356,29 @@ class ZebraBackend(BaseBackend):
             else:
                 return Role(id=str(id_), parent_id=None, full_name=role)
 
-        user_info = self.get_user_info()
-        roles = {
-            str(id_): zebra_role_to_role(id_, role)
-            for id_, role in user_info.get("roles", {}).items()
+        if self._user_roles is not None:
+            return self._user_roles
+
+        cache_path = self.get_cache_path("roles")
+        user_roles = read_cache(cache_path, USER_ROLES_CACHE_TTL)
+
+        if user_roles is None:
+            user_roles = self.get_user_info().get("roles", {})
+            write_cache(cache_path, user_roles)
+
+        self._user_roles = {
+            str(id_): zebra_role_to_role(id_, role) for id_, role in user_roles.items()
         }
 
-        return roles
+        return self._user_roles
+
+    def invalidate_user_roles(self):
+        """
+        Forget the cached user roles, so that they're fetched again from Zebra on the next call to `get_user_roles`.
+        """
+        delete_cache(self.get_cache_path("roles"))
+        self._user_info = None
+        self._user_roles = None
 
     @needs_authentication
     def get_timesheets(self, start_date, end_date=None):
@@ -262,9 +391,9 @@ class ZebraBackend(BaseBackend):
             "end_date": end_date,
         }
 
-        return self.zebra_request("get", timesheet_url, params=request_params).json()[
-            "data"
-        ]["list"]
+        response = self.zebra_request("get", timesheet_url, params=request_params)
+
+        return decode_response(response)["data"]["list"]
 
     def get_latest_role_for_alias(self, alias):
         try:
@@ -286,8 +415,8 @@ class ZebraBackend(BaseBackend):
             return {}
 
         try:
-            activities_roles = response.json()["data"]
-        except json.JsonDecodeError as e:
+            activities_roles = decode_response(response)["data"]
+        except ValueError as e:
             logger.warning(
                 "Could not decode latestActivityRoles JSON response, got %s", e
             )
@@ -1,12 +1,12 @@
 import datetime
+import math
+from concurrent.futures import ThreadPoolExecutor
 
 import click
 
 from taxi.commands.base import cli, get_timesheet_collection_for_context
 from taxi.plugins import plugins_registry
 
-from .backend import ZebraBackend
-
 
 def hours_to_days(hours):
     """
@@ -36,18 +36,16 @@ def signed_number(number, precision=2):
     return number_str
 
 
-def get_first_dow(date):
+def get_week_bounds(date):
     """
-    Return the first day of the week for the given date.
+    Return a 2-tuple `(first_dow, last_dow)` with the first and last days of the week for the given date.
     """
-    return date - datetime.timedelta(days=date.weekday())
-
+    weekday = date.weekday()
 
-def get_last_dow(date):
-    """
-    Return the last day of the week for the given date.
-    """
-    return date + datetime.timedelta(days=(6 - date.weekday()))
+    return (
+        date - datetime.timedelta(days=weekday),
+        date + datetime.timedelta(days=(6 - weekday)),
+    )
 
 
 @zebra.command()
@@ -58,23 +56,36 @@ def balance(ctx):
 
     Like the hours balance, vacation left, etc.
     """
+    # This module is imported on every taxi invocation to register the commands. Importing the backend lazily keeps
+    # requests out of `taxi --help` and `taxi config`; every other command instantiates the backend anyway when a
+    # Zebra backend is configured
+    from .backend import ZebraBackend
+
     backend = plugins_registry.get_backends_by_class(ZebraBackend)[0]
+    today = datetime.date.today()
 
-    timesheet_collection = get_timesheet_collection_for_context(ctx, None)
-    hours_to_be_pushed = timesheet_collection.get_hours(
-        pushed=False, ignored=False, unmapped=False
-    )
+    # Fetch the data from Zebra concurrently, while the local timesheets are being parsed
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        user_info_future = executor.submit(backend.get_user_info)
+        timesheets_week_future = executor.submit(
+            backend.get_timesheets, *get_week_bounds(today)
+        )
+        timesheets_today_future = executor.submit(backend.get_timesheets, today, today)
 
-    today = datetime.date.today()
+        timesheet_collection = get_timesheet_collection_for_context(ctx, None)
+        hours_to_be_pushed = timesheet_collection.get_hours(
+            pushed=False, ignored=False, unmapped=False
+        )
+
+        user_info = user_info_future.result()
+        timesheets_week = timesheets_week_future.result()
+        timesheets_today = timesheets_today_future.result()
 
-    user_info = backend.get_user_info()
-    timesheets_week = backend.get_timesheets(get_first_dow(today), get_last_dow(today))
-    timesheets_today = backend.get_timesheets(today, today)
-    total_duration_week = sum(
-        [float(timesheet["time"]) for timesheet in timesheets_week]
+    total_duration_week = math.fsum(
+        float(timesheet["time"]) for timesheet in timesheets_week
     )
-    total_duration_today = sum(
-        [float(timesheet["time"]) for timesheet in timesheets_today]
+    total_duration_today = math.fsum(
+        float(timesheet["time"]) for timesheet in timesheets_today
     )
 
     vacation_info = user_info["vacation"]
@@ -1,5 +1,5 @@
 import inspect
-from collections import namedtuple
+from operator import attrgetter
 
 import click
 
@@ -14,56 +14,74 @@ class CancelInput(Exception):
     pass
 
 
-Option = namedtuple("Option", ["value", "label", "key", "style"])
-Option.__new__.__defaults__ = (None, {})
+class Option:
+    """
+    An option shown by `prompt_options`. If `key` is `None`, the option position is used as its key.
+    """
+
+    __slots__ = ("value", "label", "key", "style")
+
+    def __init__(self, value, label, key=None, style=None):
+        self.value = value
+        self.label = label
+        self.key = key
+        self.style = style if style is not None else {}
+
+
+# `show_choices` has been added in click 7.0. Support for click < 7 is needed for distributions that only provide
+# click 6 in their package managers
+CLICK_SUPPORTS_SHOW_CHOICES = (
+    "show_choices" in inspect.signature(click.prompt).parameters
+)
+
+MESSAGE_TYPE_STYLES = {
+    "warning": {"fg": "yellow"},
+    "error": {"fg": "red"},
+}
 
 
 def format_response_messages(response_json):
     """
     Show all messages in the `messages` key of the given dict.
     """
-    message_type_kwargs = {
-        "warning": {"fg": "yellow"},
-        "error": {"fg": "red"},
-    }
+    messages = response_json.get("messages")
+    if not messages:
+        return []
 
     return [
-        click.style(message["text"], **message_type_kwargs.get(message["type"], {}))
-        for message in response_json.get("messages", [])
+        click.style(message["text"], **MESSAGE_TYPE_STYLES.get(message["type"], {}))
+        for message in messages
     ]
 
 
+def get_option_key(pos, option):
+    return option.key if option.key is not None else pos
+
+
 def prompt_options(message, options, default=None):
-    def get_option_key(pos, option):
-        return option.key if option.key is not None else pos
+    options_by_key_dict = {}
+    default_option_id = None
+    lines = []
 
-    enumerated_options = list(enumerate(options))
-    options_by_key = [
-        (get_option_key(i, option), option) for i, option in enumerated_options
-    ]
-    options_by_key_dict = dict(options_by_key)
-    try:
-        default_option_id = (
-            next(key for key, option in options_by_key if option.value == default.value)
-            if default
-            else None
-        )
-    except StopIteration:
-        default_option_id = None
+    for i, option in enumerate(options):
+        option_key = get_option_key(i, option)
+        options_by_key_dict[option_key] = option
 
-    click.secho(message + "\n", bold=True)
+        if default and default_option_id is None and option.value == default.value:
+            default_option_id = option_key
 
-    for option_key, option in options_by_key:
         if option.value is not None:
-            click.echo(
+            lines.append(
                 click.style("[{}]".format(option_key), fg="yellow", **option.style)
                 + " "
                 + click.style(option.label, **option.style)
             )
         else:
-            click.echo(option.label)
+            lines.append(option.label)
+
+    click.secho(message + "\n", bold=True)
+    click.echo("\n".join(lines) + "\n")
 
-    click.echo()
     prompt_message_default = (
         " (leave empty for {})".format(click.style(default.label, bold=True))
         if default
@@ -72,31 +90,27 @@ def prompt_options(message, options, default=None):
     prompt_message = "Select a role{}".format(prompt_message_default)
 
     while True:
-        option_id = (
-            click.prompt(
-                prompt_message,
-                default=str(default_option_id)
-                if default_option_id is not None
-                else None,
-                show_default=False,
-            )
-            .lstrip("[")
-            .rstrip("]")
+        option_id = click.prompt(
+            prompt_message,
+            default=str(default_option_id) if default_option_id is not None else None,
+            show_default=False,
+        ).strip("[]")
+
+        # Options are keyed either by their position (int) or by their explicit key (str)
+        if option_id not in options_by_key_dict:
+            try:
+                option_id = int(option_id)
+            except ValueError:
+                pass
+
+        if option_id in options_by_key_dict:
+            return options_by_key_dict[option_id].value
+
+        click.secho(
+            "`{}` is not a a valid option. Please try again.".format(option_id),
+            fg="red",
         )
 
-        try:
-            option_id = int(option_id)
-        except ValueError:
-            pass
-
-        try:
-            return options_by_key_dict[option_id][0]
-        except KeyError:
-            click.secho(
-                "`{}` is not a a valid option. Please try again.".format(option_id),
-                fg="red",
-            )
-
     return option_id
 
 
@@ -115,7 +129,7 @@ def input_role(roles, project_team, default_role=None):
 
     individual_action = "i"
     cancel = "c"
-    sorted_roles = sorted(roles, key=lambda role: role.full_name)
+    sorted_roles = sorted(roles, key=attrgetter("full_name"))
 
     options = [role_to_option(role) for role in sorted_roles] + [
         Option(value=None, label="-----"),
@@ -148,11 +162,14 @@ def input_role(roles, project_team, default_role=None):
 def prompt_role(entry, roles, context, default_role=None):
     """
     Ask the user to choose a role in `roles` for the given `entry` and return
-    it.
+    a 2-tuple `(role, alias_updated)`. If the user chooses to update the
+    alias, `alias_updated` is `True` and the configuration file is not
+    written, this is left to the caller.
     """
     mapping = aliases_database[entry.alias]
     project = context["projects_db"].get(mapping.mapping[0], mapping.backend)
     project_team = project.team if project else None
+    alias_updated = False
 
     try:
         role = input_role(roles, project_team, default_role=default_role)
@@ -172,9 +189,7 @@ def prompt_role(entry, roles, context, default_role=None):
             "default": "y",
         }
 
-        # `show_choices` has been added in click 7.0. Support for click < 7 is needed for distributions
-        # that only provide click 6 in their package managers
-        if "show_choices" in inspect.signature(click.prompt).parameters:
+        if CLICK_SUPPORTS_SHOW_CHOICES:
             prompt_kwargs["show_choices"] = False
 
         try:
@@ -193,7 +208,9 @@ def prompt_role(entry, roles, context, default_role=None):
                 context["settings"],
                 entry.alias,
                 aliases_database[entry.alias].mapping[:2] + (str(role.id),),
+                write_config=False,
             )
+            alias_updated = True
 
             click.secho(
                 "Alias {} now points to the role {}".format(
@@ -206,6 +223,8 @@ def prompt_role(entry, roles, context, default_role=None):
                 context["settings"],
                 entry.alias,
                 aliases_database[entry.alias].mapping[:2] + (NEVER_SAVE_ROLE_ID,),
+                write_config=False,
             )
+            alias_updated = True
 
-    return role
+    return role, alias_updated
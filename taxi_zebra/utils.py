@@ -1,42 +1,110 @@
+import datetime
+import json
+import os
+import time
+from functools import lru_cache
+
 from taxi.aliases import Mapping, aliases_database
 
 
 def get_role_id_from_alias(alias):
-    try:
-        mapping = aliases_database[alias]
-    except KeyError:
-        role_id = None
-    else:
-        try:
-            role_id = mapping.mapping[2]
-        except IndexError:
-            role_id = None
+    if alias not in aliases_database:
+        return None
 
-    return role_id
+    mapping = aliases_database[alias].mapping
 
+    return mapping[2] if len(mapping) > 2 else None
 
-def to_zebra_params(params):
+
+@lru_cache(maxsize=1024)
+def parse_date(value):
     """
-    Transforms the given `params` dict to values that are understood by Zebra (eg. False is represented as 'false')
+    Return the `datetime.date` corresponding to the given `YYYY-MM-DD` string, or `None` if `value` is not a valid
+    date. Results are cached since Zebra projects often share the same start and end dates.
     """
+    try:
+        return datetime.date.fromisoformat(value)
+    except (ValueError, TypeError):
+        return None
 
-    def to_zebra_value(value):
-        transform_funcs = {
-            bool: lambda v: "true" if v else "false",
-        }
-
-        return transform_funcs.get(type(value), lambda v: v)(value)
 
-    return {param: to_zebra_value(value) for param, value in params.items()}
+def to_zebra_params(params):
+    """
+    Transforms the given `params` dict to values that are understood by Zebra (eg. False is represented as 'false')
+    """
+    return {
+        param: "true" if value is True else "false" if value is False else value
+        for param, value in params.items()
+    }
 
 
-def update_alias_mapping(settings, alias, new_mapping):
+def update_alias_mapping(settings, alias, new_mapping, write_config=True):
     """
     Override `alias` mapping in the user configuration file with the given `new_mapping`, which should be a tuple with
-    2 or 3 elements (in the form `(project_id, activity_id, role_id)`).
+    2 or 3 elements (in the form `(project_id, activity_id, role_id)`). If `write_config` is `False`, the configuration
+    file is not written and it's up to the caller to call `settings.write_config()`.
     """
     mapping = aliases_database[alias]
     new_mapping = Mapping(mapping=new_mapping, backend=mapping.backend)
     aliases_database[alias] = new_mapping
     settings.add_alias(alias, new_mapping)
-    settings.write_config()
+
+    if write_config:
+        settings.write_config()
+
+
+def get_default_cache_dir():
+    """
+    Return the directory where Zebra responses are cached, following the XDG base directory specification.
+    """
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+
+    return os.path.join(cache_home, "taxi-zebra")
+
+
+def read_cache(path, max_age=None):
+    """
+    Return the data stored in the cache file at `path`, or `None` if it doesn't exist, can't be read or is older than
+    `max_age` seconds. If `max_age` is `None`, the data never expires.
+    """
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    try:
+        if max_age is not None and time.time() - cache["fetched_at"] > max_age:
+            return None
+
+        return cache["data"]
+    except (KeyError, TypeError):
+        return None
+
+
+def write_cache(path, data):
+    """
+    Store `data` in the cache file at `path`. The file is written atomically so that concurrent readers never see a
+    partially written file.
+    """
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "w") as f:
+            json.dump({"fetched_at": time.time(), "data": data}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def delete_cache(path):
+    """
+    Remove the cache file at `path`, if it exists.
+    """
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,69 @@
+import pytest
+import responses
+
+import taxi.aliases
+from taxi.aliases import Mapping
+from taxi.projects import ProjectsDb
+from taxi.ui.tty import TtyUi
+from taxi_zebra.backend import ZebraBackend
+
+hostname = "zebralocal"
+token = "a-long-hexadecimal-token"
+base_endpoint = "https://{}:443".format(hostname)
+urls = {
+    name: base_endpoint + url
+    for name, url in {
+        "user_info": "/api/v2/users/me",
+        "timesheets": "/api/v2/timesheets/",
+        "timesheets_list": "/api/v2/timesheets",
+        "latestActivityRoles": "/api/v2/latestActivityRoles",
+        "projects": "/api/v2/projects/",
+    }.items()
+}
+
+
+@pytest.fixture
+def aliases_database():
+    taxi.aliases.aliases_database.reset()
+    taxi.aliases.aliases_database["alias1"] = Mapping(
+        mapping=("1", "1"), backend="local"
+    )
+    taxi.aliases.aliases_database["alias_do_not_ask_for_role"] = Mapping(
+        mapping=("1", "1", "0"), backend="local"
+    )
+
+    yield taxi.aliases.aliases_database
+
+
+@pytest.fixture(scope="module")
+def responses_patcher():
+    # Patching requests is done once per module, `mocked_responses` resets the registered responses after each test
+    r = responses.RequestsMock(assert_all_requests_are_fired=False)
+    r.start()
+    yield r
+    r.stop()
+
+
+@pytest.fixture
+def mocked_responses(responses_patcher):
+    yield responses_patcher
+    responses_patcher.reset()
+
+
+@pytest.fixture(scope="session")
+def tty_view():
+    return TtyUi()
+
+
+@pytest.fixture
+def backend(aliases_database, tmp_path, tty_view):
+    projects_db_path = str(tmp_path / "projects.json")
+    yield ZebraBackend(
+        username=token,
+        password="",
+        hostname=hostname,
+        port=443,
+        path="",
+        options={"cache_dir": str(tmp_path / "cache")},
+        context={"view": tty_view, "projects_db": ProjectsDb(projects_db_path)},
+    )
@@ -1,68 +1,27 @@
 import datetime
 import json
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 
 import pytest
 import responses
 
-import taxi.aliases
 from taxi.aliases import Mapping
 from taxi.backends import PushEntryFailed
 from taxi.exceptions import TaxiException
-from taxi.projects import ProjectsDb
 from taxi.timesheet.entry import Entry
-from taxi.ui.tty import TtyUi
 from taxi_zebra.backend import Role, ZebraBackend
+from taxi_zebra.utils import write_cache
 
-hostname = "zebralocal"
-token = "a-long-hexadecimal-token"
-base_endpoint = "https://{}:443".format(hostname)
-urls = {
-    name: base_endpoint + url
-    for name, url in {
-        "user_info": "/api/v2/users/me",
-        "timesheets": "/api/v2/timesheets/",
-        "latestActivityRoles": "/api/v2/latestActivityRoles",
-    }.items()
-}
+from .conftest import hostname, token, urls
 
+push_date = datetime.date(2024, 1, 15)
+# Roles of the user, as returned by `ZebraBackend.get_user_roles` for `user_info_body`
+role_2 = Role(id="2", parent_id="1", full_name="Role")
+role_3 = Role(id="3", parent_id="1", full_name="Role 2")
 
-@pytest.fixture
-def aliases_database():
-    taxi.aliases.aliases_database.reset()
-    taxi.aliases.aliases_database["alias1"] = Mapping(
-        mapping=("1", "1"), backend="local"
-    )
-    taxi.aliases.aliases_database["alias_do_not_ask_for_role"] = Mapping(
-        mapping=("1", "1", "0"), backend="local"
-    )
-
-    yield taxi.aliases.aliases_database
-
-
-@pytest.fixture
-def mocked_responses():
-    with responses.RequestsMock(assert_all_requests_are_fired=False) as r:
-        yield r
-
-
-@pytest.fixture
-def backend(aliases_database, tmp_path):
-    projects_db_path = str(tmp_path / "projects.json")
-    yield ZebraBackend(
-        username=token,
-        password="",
-        hostname=hostname,
-        port=443,
-        path="",
-        options={},
-        context={"view": TtyUi(), "projects_db": ProjectsDb(projects_db_path)},
-    )
-
-
-@pytest.fixture
-def authenticated_responses(mocked_responses):
-    user_info = {
+# Response bodies shared by most tests, serialized once
+user_info_body = json.dumps(
+    {
         "success": True,
         "data": {
             "roles": {
@@ -71,26 +30,40 @@ def authenticated_responses(mocked_responses):
             }
         },
     }
-    latest_activity_roles = {"success": True, "data": {"1": 2}}
+)
+latest_activity_roles_body = json.dumps({"success": True, "data": {"1": 2}})
+success_body = json.dumps({"success": True})
+role_needed_body = json.dumps({"errorCode": "role_needed"})
 
+
+@pytest.fixture
+def prompt_role(monkeypatch):
+    stub = MagicMock()
+    monkeypatch.setattr("taxi_zebra.backend.prompt_role", stub)
+
+    return stub
+
+
+@pytest.fixture
+def authenticated_responses(mocked_responses):
     mocked_responses.add(
         responses.GET,
         urls["user_info"],
-        body=json.dumps(user_info),
+        body=user_info_body,
         status=200,
         content_type="application/json",
     )
     mocked_responses.add(
         responses.GET,
         urls["latestActivityRoles"],
-        body=json.dumps(latest_activity_roles),
+        body=latest_activity_roles_body,
         status=200,
         content_type="application/json",
     )
     mocked_responses.add(
         responses.POST,
         urls["timesheets"],
-        body=json.dumps({"success": True}),
+        body=success_body,
         status=200,
         content_type="application/json",
     )
@@ -103,14 +76,14 @@ def require_role(authenticated_responses):
     authenticated_responses.add(
         responses.POST,
         urls["timesheets"],
-        body=json.dumps({"errorCode": "role_needed"}),
+        body=role_needed_body,
         status=400,
         content_type="application/json",
     )
     authenticated_responses.add(
         responses.POST,
         urls["timesheets"],
-        body=json.dumps({"success": True}),
+        body=success_body,
         status=200,
         content_type="application/json",
     )
@@ -118,48 +91,46 @@ def require_role(authenticated_responses):
     return authenticated_responses
 
 
-def test_role_is_prompted_when_needed(authenticated_responses, backend):
+def count_calls(mocked_responses, url):
+    return len([call for call in mocked_responses.calls if call.request.url == url])
+
+
+def test_role_is_prompted_when_needed(authenticated_responses, backend, prompt_role):
     require_role(authenticated_responses)
 
-    role = Role(id="2", parent_id="1", full_name="Role")
     entry = Entry(alias="alias1", duration=1, description="")
 
-    with patch("taxi_zebra.backend.prompt_role") as prompt_role:
-        prompt_role.return_value = role
-        backend.push_entry(datetime.date.today(), entry)
-
-        prompt_role.assert_called_once_with(
-            entry,
-            [role, Role(id="3", parent_id="1", full_name="Role 2")],
-            {
-                "view": backend.context["view"],
-                "projects_db": backend.context["projects_db"],
-            },
-            default_role=Role(id="2", parent_id="1", full_name="Role"),
-        )
+    prompt_role.return_value = (role_2, False)
+    backend.push_entry(push_date, entry)
 
-    push_call = authenticated_responses.calls[-1]
-    assert "role_id={}".format(role.id) in push_call.request.body
-    assert "individual_action=false" in push_call.request.body
+    prompt_role.assert_called_once_with(
+        entry,
+        [role_2, role_3],
+        {
+            "view": backend.context["view"],
+            "projects_db": backend.context["projects_db"],
+        },
+        default_role=role_2,
+    )
 
 
-def test_role_is_not_prompted_when_not_needed(authenticated_responses, backend):
+def test_role_is_not_prompted_when_not_needed(
+    authenticated_responses, backend, prompt_role
+):
     entry = Entry(alias="alias1", duration=1, description="")
 
-    with patch("taxi_zebra.backend.prompt_role") as prompt_role:
-        backend.push_entry(datetime.date.today(), entry)
-        prompt_role.assert_not_called()
+    backend.push_entry(push_date, entry)
+    prompt_role.assert_not_called()
 
 
 def test_role_is_not_prompted_when_alias_has_role(
-    authenticated_responses, backend, aliases_database
+    authenticated_responses, backend, aliases_database, prompt_role
 ):
     entry = Entry(alias="alias2", duration=1, description="")
     aliases_database["alias2"] = Mapping(mapping=("1", "1", "2"), backend="local")
 
-    with patch("taxi_zebra.backend.prompt_role") as prompt_role:
-        backend.push_entry(datetime.date.today(), entry)
-        prompt_role.assert_not_called()
+    backend.push_entry(push_date, entry)
+    prompt_role.assert_not_called()
 
     push_call = authenticated_responses.calls[-1]
     assert "role_id=2" in push_call.request.body
@@ -179,32 +150,66 @@ def test_push_returns_backend_messages(authenticated_responses, backend):
         content_type="application/json",
     )
     entry = Entry(alias="alias1", duration=1, description="")
-    additional_info = backend.push_entry(datetime.date.today(), entry)
+    additional_info = backend.push_entry(push_date, entry)
 
     assert "Hello world" in additional_info
 
 
-@pytest.mark.parametrize("alias", ["alias1", "alias_do_not_ask_for_role"])
-def test_individual_action_flag(authenticated_responses, backend, alias):
-    require_role(authenticated_responses)
+@pytest.mark.parametrize(
+    "alias,role_needed,selected_role,expected_params,unexpected_params",
+    [
+        # Role selected in the prompt
+        (
+            "alias1",
+            True,
+            role_2,
+            ["role_id=2", "individual_action=false"],
+            [],
+        ),
+        # Individual action selected in the prompt
+        ("alias1", True, None, ["individual_action=true"], ["role_id"]),
+        (
+            "alias_do_not_ask_for_role",
+            True,
+            None,
+            ["individual_action=true"],
+            ["role_id"],
+        ),
+        # Activity that doesn't require a role
+        (
+            "alias_do_not_ask_for_role",
+            False,
+            None,
+            [],
+            ["individual_action", "role_id"],
+        ),
+    ],
+)
+def test_push_role_params(
+    authenticated_responses,
+    backend,
+    prompt_role,
+    alias,
+    role_needed,
+    selected_role,
+    expected_params,
+    unexpected_params,
+):
+    if role_needed:
+        require_role(authenticated_responses)
     entry = Entry(alias=alias, duration=1, description="")
 
-    with patch("taxi_zebra.backend.prompt_role") as prompt_role:
-        prompt_role.return_value = None
-        backend.push_entry(datetime.date.today(), entry)
-
-    push_call = authenticated_responses.calls[-1]
-    assert "individual_action=true" in push_call.request.body
-    assert "role_id" not in push_call.request.body
+    prompt_role.return_value = (selected_role, False)
+    backend.push_entry(push_date, entry)
 
-
-def test_push_alias_without_required_role_works(authenticated_responses, backend):
-    entry = Entry(alias="alias_do_not_ask_for_role", duration=1, description="")
-    backend.push_entry(datetime.date.today(), entry)
+    assert prompt_role.called == role_needed
 
     push_call = authenticated_responses.calls[-1]
-    assert "individual_action" not in push_call.request.body
-    assert "role_id" not in push_call.request.body
+    assert "date=2024-01-15" in push_call.request.body
+    for param in expected_params:
+        assert param in push_call.request.body
+    for param in unexpected_params:
+        assert param not in push_call.request.body
 
 
 def test_latest_role_is_selected(authenticated_responses, backend):
@@ -213,7 +218,7 @@ def test_latest_role_is_selected(authenticated_responses, backend):
 
     with patch("click.termui.visible_prompt_func") as patched_input:
         patched_input.side_effect = ["", "n"]
-        backend.push_entry(datetime.date.today(), entry)
+        backend.push_entry(push_date, entry)
 
     push_call = authenticated_responses.calls[-1]
     assert "role_id=2" in push_call.request.body
@@ -235,7 +240,7 @@ def test_latest_role_is_not_proposed_when_not_available(
     with patch("click.termui.visible_prompt_func") as patched_input:
         patched_input.return_value = "c"
         with pytest.raises(PushEntryFailed):
-            backend.push_entry(datetime.date.today(), entry)
+            backend.push_entry(push_date, entry)
 
     assert "Select a role:" in capsys.readouterr().out
 
@@ -256,7 +261,7 @@ def test_no_default_role_proposed_when_alias_never_used(
     with patch("click.termui.visible_prompt_func") as patched_input:
         patched_input.return_value = "c"
         with pytest.raises(PushEntryFailed):
-            backend.push_entry(datetime.date.today(), entry)
+            backend.push_entry(push_date, entry)
 
     assert "Select a role:" in capsys.readouterr().out
 
@@ -271,11 +276,208 @@ def test_default_role_updates_between_entries(authenticated_responses, backend,
         patched_input.side_effect = ["1", "n", "", "n"]
         for entry in entries:
             require_role(authenticated_responses)
-            backend.push_entry(datetime.date.today(), entry)
+            backend.push_entry(push_date, entry)
 
     assert "Select a role (leave empty for Role 2):" in capsys.readouterr().out
 
 
+def test_config_is_written_once_after_push(
+    authenticated_responses, backend, aliases_database
+):
+    aliases_database["alias2"] = Mapping(mapping=("1", "2"), backend="local")
+    backend.context["settings"] = MagicMock()
+    entries = [
+        Entry(alias="alias1", duration=1, description=""),
+        Entry(alias="alias2", duration=1, description=""),
+    ]
+
+    with patch("click.termui.visible_prompt_func") as patched_input:
+        patched_input.side_effect = ["0", "y", "0", "y"]
+        for entry in entries:
+            require_role(authenticated_responses)
+            backend.push_entry(push_date, entry)
+
+    assert aliases_database["alias2"].mapping == ("1", "2", "2")
+    backend.context["settings"].write_config.assert_not_called()
+
+    backend.post_push_entries()
+    backend.context["settings"].write_config.assert_called_once_with()
+
+
+def test_config_write_failure_is_reported(
+    authenticated_responses, backend, aliases_database, capsys
+):
+    backend.context["settings"] = MagicMock()
+    backend.context["settings"].write_config.side_effect = PermissionError(
+        "Permission denied"
+    )
+
+    with patch("click.termui.visible_prompt_func") as patched_input:
+        patched_input.side_effect = ["0", "y"]
+        require_role(authenticated_responses)
+        backend.push_entry(push_date, Entry(alias="alias1", duration=1, description=""))
+
+    with patch.object(backend, "close") as close:
+        backend.post_push_entries()
+
+    assert "Could not save the updated aliases" in capsys.readouterr().out
+    close.assert_called_once_with()
+
+
+def test_user_roles_are_cached_between_backends(authenticated_responses, backend):
+    backend.get_user_roles()
+
+    other_backend = ZebraBackend(
+        username=token,
+        password="",
+        hostname=hostname,
+        port=443,
+        path="",
+        options=backend.options,
+        context=backend.context,
+    )
+
+    assert other_backend.get_user_roles() == backend.get_user_roles()
+    assert count_calls(authenticated_responses, urls["user_info"]) == 1
+
+
+def test_user_roles_are_refreshed_when_role_invalid(
+    authenticated_responses, backend, prompt_role
+):
+    require_role(authenticated_responses)
+    authenticated_responses.replace(
+        responses.POST,
+        urls["timesheets"],
+        body=json.dumps({"errorCode": "role_invalid"}),
+        status=400,
+        content_type="application/json",
+    )
+    backend.get_user_roles()
+    entry = Entry(alias="alias1", duration=1, description="")
+
+    prompt_role.return_value = (None, False)
+    backend.push_entry(push_date, entry)
+
+    assert count_calls(authenticated_responses, urls["user_info"]) == 2
+
+
+def test_prompted_roles_are_fetched_from_zebra(
+    authenticated_responses, backend, prompt_role
+):
+    # Role 3 was granted after the roles were cached
+    write_cache(
+        backend.get_cache_path("roles"),
+        {"2": {"id": 2, "parent_id": 1, "full_name": "Role"}},
+    )
+    require_role(authenticated_responses)
+    entry = Entry(alias="alias1", duration=1, description="")
+
+    prompt_role.return_value = (role_3, False)
+    backend.push_entry(push_date, entry)
+
+    assert prompt_role.call_args[0][1] == [role_2, role_3]
+
+
+def test_user_roles_are_invalidated_when_selected_role_is_invalid(
+    authenticated_responses, backend, prompt_role
+):
+    # Both the first push and the push with the selected role are rejected
+    authenticated_responses.replace(
+        responses.POST,
+        urls["timesheets"],
+        body=json.dumps(
+            {"success": False, "errorCode": "role_invalid", "error": "Invalid role"}
+        ),
+        status=400,
+        content_type="application/json",
+    )
+    entry = Entry(alias="alias1", duration=1, description="")
+
+    prompt_role.return_value = (role_2, False)
+    with pytest.raises(PushEntryFailed):
+        backend.push_entry(push_date, entry)
+
+    user_info_calls = count_calls(authenticated_responses, urls["user_info"])
+    backend.get_user_roles()
+
+    assert count_calls(authenticated_responses, urls["user_info"]) == (
+        user_info_calls + 1
+    )
+
+
+def add_projects_response(mocked_responses, **kwargs):
+    project = {
+        "id": 1,
+        "name": "Project",
+        "description": "",
+        "budget": 0,
+        "circle_id": 3,
+        "start_date": "2023-01-01",
+        "end_date": None,
+        "activities": [{"id": 2, "name": "Activity", "is_active": True, "alias": ""}],
+    }
+    mocked_responses.add(
+        responses.GET,
+        urls["projects"],
+        body=json.dumps({"success": True, "data": {"list": {"1": project}}}),
+        status=200,
+        content_type="application/json",
+        **kwargs
+    )
+
+
+def test_get_projects_parses_dates(mocked_responses, backend):
+    add_projects_response(mocked_responses)
+
+    projects = backend.get_projects()
+
+    assert len(projects) == 1
+    assert projects[0].start_date == datetime.date(2023, 1, 1)
+    assert projects[0].end_date is None
+    assert projects[0].team == "3"
+
+
+def test_projects_are_read_from_cache_when_not_modified(mocked_responses, backend):
+    add_projects_response(mocked_responses, headers={"ETag": '"v1"'})
+    mocked_responses.add(responses.GET, urls["projects"], status=304)
+
+    backend.get_projects()
+    projects = backend.get_projects()
+
+    assert mocked_responses.calls[-1].request.headers["If-None-Match"] == '"v1"'
+    assert [project.name for project in projects] == ["Project"]
+
+
+def test_activities_roles_fall_back_when_retries_are_exhausted(
+    mocked_responses, backend
+):
+    mocked_responses.add(responses.GET, urls["latestActivityRoles"], status=503)
+
+    assert backend.get_activities_roles() == {}
+    assert count_calls(mocked_responses, urls["latestActivityRoles"]) == 4
+
+
+def test_get_projects_raises_taxi_exception_when_retries_are_exhausted(
+    mocked_responses, backend
+):
+    mocked_responses.add(responses.GET, urls["projects"], status=503, body="")
+
+    with pytest.raises(TaxiException):
+        backend.get_projects()
+
+
+def test_user_roles_cache_is_dropped_on_login_failure(authenticated_responses, backend):
+    backend.get_user_roles()
+    authenticated_responses.add(responses.GET, urls["user_info"], status=401)
+    authenticated_responses.add(responses.GET, urls["projects"], status=401)
+
+    with pytest.raises(TaxiException):
+        backend.get_projects()
+
+    with pytest.raises(TaxiException):
+        backend.get_user_roles()
+
+
 def test_zebra_backend_doesnt_accept_password():
     with pytest.raises(TaxiException):
         ZebraBackend(
@@ -0,0 +1,95 @@
+import datetime
+import json
+from unittest.mock import MagicMock
+
+import pytest
+import responses
+from click.testing import CliRunner
+from responses import matchers
+
+from taxi_zebra.commands import get_week_bounds, zebra
+
+from .conftest import urls
+
+user_info_body = json.dumps(
+    {
+        "success": True,
+        "data": {
+            "hours": {"hours": {"balance": -2.5}},
+            "vacation": {"total_available": 200, "planned": 16, "used": 20},
+        },
+    }
+)
+
+
+def timesheets_body(*times):
+    return json.dumps(
+        {
+            "success": True,
+            "data": {"list": [{"time": str(time)} for time in times]},
+        }
+    )
+
+
+@pytest.fixture
+def run_balance(monkeypatch, backend):
+    timesheet_collection = MagicMock()
+    timesheet_collection.get_hours.return_value = 1.5
+    monkeypatch.setattr(
+        "taxi_zebra.commands.get_timesheet_collection_for_context",
+        lambda ctx, entries: timesheet_collection,
+    )
+    monkeypatch.setattr(
+        "taxi_zebra.commands.plugins_registry.get_backends_by_class",
+        lambda backend_class: [backend],
+    )
+
+    return lambda: CliRunner().invoke(zebra, ["balance"])
+
+
+def add_timesheets_response(mocked_responses, start_date, end_date, body):
+    mocked_responses.add(
+        responses.GET,
+        urls["timesheets_list"],
+        body=body,
+        match=[
+            matchers.query_param_matcher(
+                {"start_date": str(start_date), "end_date": str(end_date)}
+            )
+        ],
+    )
+
+
+def test_balance_shows_week_and_today_hours(mocked_responses, run_balance):
+    today = datetime.date.today()
+    mocked_responses.add(responses.GET, urls["user_info"], body=user_info_body)
+    # The week timesheets include entries from other days than today
+    add_timesheets_response(
+        mocked_responses, *get_week_bounds(today), body=timesheets_body(8, 4.25, 1.5)
+    )
+    add_timesheets_response(mocked_responses, today, today, body=timesheets_body(1.5))
+
+    result = run_balance()
+
+    assert result.exit_code == 0, result.output
+    assert result.output.splitlines() == [
+        "Hours balance: -2.50",
+        "Hours balance after push: -1.00",
+        "Hours done this week: 13.75",
+        "Hours done today: 1.50",
+        "Hours to be pushed: 1.50",
+        "Vacation left: 20 days, 4.00 hours",
+    ]
+
+
+def test_balance_reports_errors_raised_while_fetching_data(
+    mocked_responses, run_balance
+):
+    mocked_responses.add(responses.GET, urls["user_info"], status=401)
+    mocked_responses.add(responses.GET, urls["timesheets_list"], body=timesheets_body())
+
+    result = run_balance()
+
+    # TaxiException is a ClickException, so click shows it to the user
+    assert result.exit_code == 1
+    assert "Error: Login failed" in result.output